@@ -1,31 +1,58 @@
 """Utilities and helper functions."""
 
+import functools
 import sys
 
 from oslo_log import log as logging
 
 LOG = logging.getLogger(__name__)
 
-def get_fname(stack_frame):
-    fname = sys._getframe(stack_frame).f_code.co_name
-    return fname
+# Bound once so the hot path does a single global lookup
+_getframe = sys._getframe
+
 
 def log_entry():
 
+    # Nothing to do if the record would be dropped anyway
+    if not LOG.isEnabledFor(logging.INFO):
+        return
+
     # We are logging the function which called this function and its caller
-    fname = get_fname(1)
-    caller = get_fname(2)
+    frame = _getframe(1)
+    fname = frame.f_code.co_name
+    caller = frame.f_back.f_code.co_name
 
     # Log name of executing function and name of caller
-    LOG.info(fname +"(): caller: " +caller)
+    LOG.info("%s(): caller: %s", fname, caller)
+
 
 def log_entry_msg(msg):
 
+    # Nothing to do if the record would be dropped anyway
+    if not LOG.isEnabledFor(logging.INFO):
+        return
+
     # We are logging the function which called this function and its caller
-    fname = get_fname(1)
-    caller = get_fname(2)
+    frame = _getframe(1)
+    fname = frame.f_code.co_name
+    caller = frame.f_back.f_code.co_name
 
     # Log name of executing function and name of caller
-    LOG.info(fname +"(): caller: " +caller +" [" +msg +"]")
+    LOG.info("%s(): caller: %s [%s]", fname, caller, msg)
+
+
+def log_entry_decorator(func):
+
+    # The name of the decorated function never changes, so bake it into the
+    # message format once here rather than walking the stack for it (and
+    # formatting it) on every call
+    fmt = "%s(): caller: %%s" % func.__name__
 
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if LOG.isEnabledFor(logging.INFO):
+            caller = _getframe(1).f_code.co_name
+            LOG.info(fmt, caller)
+        return func(*args, **kwargs)
 
+    return wrapper
@@ -1596,9 +1596,8 @@ class ComputeManager(manager.Manager):
 
         return _sync_refresh()
 
+    @log_utils.log_entry_decorator
     def _await_block_device_map_created(self, context, vol_id):
-        LOG.info('%s(): caller(): %s', log_utils.get_fname(1), log_utils.get_fname(2))
-
         # TODO(yamahata): creating volume simultaneously
         #                 reduces creation time?
         # TODO(yamahata): eliminate dumb polling
@@ -62,7 +62,7 @@ PROJECT_READER_OR_SYSTEM_READER = 'rule:system_or_project_reader'
 # `member` implies `reader`.
 # For example: If we give access to 'reader' it means the 'admin' and
 # 'member' also get access.
-rules = [
+rules = (
     policy.RuleDefault(
         "context_is_admin",
         "role:admin",
@@ -98,8 +98,8 @@ rules = [
     policy.RuleDefault(
         "system_or_project_reader",
         "rule:system_reader_api or rule:project_reader_api",
-        "Default rule for System+Project read only APIs.")
-]
+        "Default rule for System+Project read only APIs."),
+)
 
 
 def list_rules():
@@ -13,8 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import six
+import collections
+import functools
 
+import fixtures
 import mock
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -30,6 +32,51 @@ from nova.tests.unit.virt.libvirt import fakelibvirt
 CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
+# The usages (and allocations) expected for a single server booted with a
+# flavor of 2048MB RAM and 10GB root + 10GB ephemeral disk and N (P)CPUs
+_EXP_VCPU_2 = {'DISK_GB': 20, 'MEMORY_MB': 2048, 'VCPU': 2}
+_EXP_PCPU_2 = {'DISK_GB': 20, 'MEMORY_MB': 2048, 'PCPU': 2}
+_EXP_PCPU_5 = {'DISK_GB': 20, 'MEMORY_MB': 2048, 'PCPU': 5}
+
+# The network requests used by NUMAServersWithNetworksTest
+_NET1 = ({'uuid': base.LibvirtNeutronFixture.network_1['id']},)
+_NET12 = (_NET1[0], {'uuid': base.LibvirtNeutronFixture.network_2['id']})
+_NET13 = (_NET1[0], {'uuid': base.LibvirtNeutronFixture.network_3['id']})
+
+
+# The inventory, usages and allocations of a resource provider for a server
+_RPSnapshot = collections.namedtuple(
+    '_RPSnapshot', ['inventory', 'usages', 'allocations'])
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_host_info(**kwargs):
+    # fakelibvirt.Connection only ever reads from the HostInfo it's given, so
+    # the same object can be safely shared between tests and computes
+    return fakelibvirt.HostInfo(**kwargs)
+
+
+class _FilterSpy(object):
+    """Wrap a filter's host_passes method and record the calls made to it.
+
+    This is a lightweight stand-in for ``mock.Mock(wraps=...)``, which does a
+    lot more bookkeeping than we need for every scheduling pass.
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.called = False
+        self.call_args_list = []
+
+    def __call__(self, *args, **kwargs):
+        self.called = True
+        self.call_args_list.append((args, kwargs))
+        return self.fn(*args, **kwargs)
+
+    def reset(self):
+        self.called = False
+        self.call_args_list.clear()
+
 
 class NUMAServersTestBase(base.ServersTestBase):
 
@@ -42,32 +89,115 @@ class NUMAServersTestBase(base.ServersTestBase):
         # this
         host_manager = self.scheduler.manager.driver.host_manager
         numa_filter_class = host_manager.filter_cls_map['NUMATopologyFilter']
-        host_pass_mock = mock.Mock(wraps=numa_filter_class().host_passes)
+        self.mock_filter = _FilterSpy(numa_filter_class().host_passes)
         _p = mock.patch('nova.scheduler.filters'
                         '.numa_topology_filter.NUMATopologyFilter.host_passes',
-                        side_effect=host_pass_mock)
-        self.mock_filter = _p.start()
+                        new=self.mock_filter)
+        _p.start()
         self.addCleanup(_p.stop)
 
+        # TODO(stephenfin): The mock of 'migrate_disk_and_power_off' should
+        # probably be less...dumb
+        self.useFixture(fixtures.MockPatch(
+            'nova.virt.libvirt.driver.LibvirtDriver'
+            '.migrate_disk_and_power_off', return_value='{}'))
+
+    def _get_rp_snapshot(self, rp_uuid, server_id):
+        """Fetch everything placement knows about a provider and a server.
+
+        :param rp_uuid: The UUID of the resource provider.
+        :param server_id: The ID of the server (consumer) to get the
+            allocations of.
+        :returns: An ``_RPSnapshot`` of the provider's inventories, the
+            provider's usages and the server's allocations.
+        """
+        inventory = self.placement_api.get(
+            '/resource_providers/%s/inventories' % rp_uuid).body[
+                'inventories']
+        usages = self.placement_api.get(
+            '/resource_providers/%s/usages' % rp_uuid).body['usages']
+        allocations = self.placement_api.get(
+            '/allocations/%s' % server_id).body['allocations']
+        return _RPSnapshot(inventory, usages, allocations)
+
+    def _delete_servers(self, servers):
+        """Delete several servers and wait for all of them to be gone.
+
+        The delete requests are all sent before waiting on any of them so that
+        the deletions can make progress at the same time.
+
+        :param servers: A list of servers, as returned by the API.
+        """
+        for server in servers:
+            self.api.delete_server(server['id'])
+
+        for server in servers:
+            self._wait_for_deletion(server['id'])
+
+    def _create_and_wait(self, flavor_id, networks=None, end_status='ACTIVE'):
+        """Create a server and wait for it to reach the given status.
+
+        :param flavor_id: The ID of the flavor to boot the server with.
+        :param networks: The networks to request for the server, if any.
+        :param end_status: The status to wait for the server to reach.
+        :returns: The server, as returned by the API once in ``end_status``.
+        """
+        server = self._build_server(flavor_id)
+        if networks is not None:
+            server['networks'] = networks
+
+        created_server = self.api.post_server({'server': server})
+        LOG.debug("created_server: %s", created_server)
+
+        return self._wait_for_state_change(created_server, end_status)
+
 
 class NUMAServersTest(NUMAServersTestBase):
 
-    def _run_build_test(self, flavor_id, end_status='ACTIVE',
-                        filter_called_on_error=True,
-                        expected_usage=None):
+    def setUp(self):
+        super(NUMAServersTest, self).setUp()
+
+        self._compute = None
 
-        # NOTE(bhagyashris): Always use host as 'compute1' so that it's
-        # possible to get resource provider information for verifying
-        # compute usages. This host name 'compute1' is hard coded in
-        # Connection class in fakelibvirt.py.
-        # TODO(stephenfin): Remove the hardcoded limit, possibly overridding
-        # 'start_service' to make sure there isn't a mismatch
-        self.compute = self.start_service('compute', host='compute1')
+    def _ensure_compute(self):
+        """Start the 'compute1' compute service, if not already started.
 
-        compute_rp_uuid = self.placement_api.get(
+        :returns: The compute service.
+        """
+        if self._compute is None:
+            # NOTE(bhagyashris): Always use host as 'compute1' so that it's
+            # possible to get resource provider information for verifying
+            # compute usages. This host name 'compute1' is hard coded in
+            # Connection class in fakelibvirt.py.
+            # TODO(stephenfin): Remove the hardcoded limit, possibly
+            # overridding 'start_service' to make sure there isn't a mismatch
+            self._compute = self.start_service('compute', host='compute1')
+
+        return self._compute
+
+    def _get_compute_rp_uuid(self):
+        return self.placement_api.get(
             '/resource_providers?name=compute1').body[
             'resource_providers'][0]['uuid']
 
+    def _get_provider_usages(self, rp_uuids):
+        """Fetch the usages of each of the given resource providers.
+
+        :param rp_uuids: An iterable of resource provider UUIDs.
+        :returns: A dict of resource provider UUID to usages dict.
+        """
+        return {
+            rp_uuid: self.placement_api.get(
+                '/resource_providers/%s/usages' % rp_uuid).body['usages']
+            for rp_uuid in rp_uuids
+        }
+
+    def _run_build_test(self, flavor_id, end_status='ACTIVE',
+                        filter_called_on_error=True,
+                        expected_usage=None):
+
+        self.compute = self._ensure_compute()
+
         # Create server
         good_server = self._build_server(flavor_id)
 
@@ -82,11 +212,6 @@ class NUMAServersTest(NUMAServersTestBase):
         found_server = self.api.get_server(created_server_id)
         self.assertEqual(created_server_id, found_server['id'])
 
-        # It should also be in the all-servers list
-        servers = self.api.get_servers()
-        server_ids = [s['id'] for s in servers]
-        self.assertIn(created_server_id, server_ids)
-
         # Validate the quota usage
         if filter_called_on_error and end_status == 'ACTIVE':
             quota_details = self.api.get_quota_detail()
@@ -105,7 +230,13 @@ class NUMAServersTest(NUMAServersTestBase):
 
         found_server = self._wait_for_state_change(found_server, end_status)
 
+        # There's nothing more to check for an instance that failed to
+        # schedule: it has no allocations and there is no usage to verify
+        if end_status == 'ERROR':
+            return created_server
+
         if expected_usage:
+            compute_rp_uuid = self._get_compute_rp_uuid()
             compute_usage = self.placement_api.get(
                 '/resource_providers/%s/usages' % compute_rp_uuid).body[
                     'usages']
@@ -114,6 +245,23 @@ class NUMAServersTest(NUMAServersTestBase):
         self.addCleanup(self._delete_server, found_server)
         return created_server
 
+    def _test_create_server_fails(self, host_info, extra_spec, vcpu=2,
+                                  filter_called_on_error=True):
+        """Boot a server on the given host and ensure it fails to schedule.
+
+        :param host_info: The fakelibvirt.HostInfo of the compute host.
+        :param extra_spec: The extra specs of the flavor to boot with.
+        :param vcpu: The number of vCPUs of the flavor to boot with.
+        :param filter_called_on_error: Whether NUMATopologyFilter is expected
+            to be reached, i.e. whether placement finds any candidates.
+        """
+        fake_connection = self._get_connection(host_info=host_info)
+        self.mock_conn.return_value = fake_connection
+
+        flavor_id = self._create_flavor(vcpu=vcpu, extra_spec=extra_spec)
+        self._run_build_test(flavor_id, end_status='ERROR',
+                             filter_called_on_error=filter_called_on_error)
+
     def test_create_server_with_numa_topology(self):
         """Create a server with two NUMA nodes.
 
@@ -121,17 +269,15 @@ class NUMAServersTest(NUMAServersTestBase):
         nodes.
         """
 
-        host_info = fakelibvirt.HostInfo(cpu_nodes=2, cpu_sockets=1,
-                                         cpu_cores=2, cpu_threads=2,
-                                         kB_mem=15740000)
+        host_info = _cached_host_info(cpu_nodes=2, cpu_sockets=1,
+                                      cpu_cores=2, cpu_threads=2,
+                                      kB_mem=15740000)
         fake_connection = self._get_connection(host_info=host_info)
         self.mock_conn.return_value = fake_connection
 
         extra_spec = {'hw:numa_nodes': '2'}
         flavor_id = self._create_flavor(vcpu=2, extra_spec=extra_spec)
-        expected_usage = {'DISK_GB': 20, 'MEMORY_MB': 2048, 'VCPU': 2}
-
-        server = self._run_build_test(flavor_id, expected_usage=expected_usage)
+        server = self._run_build_test(flavor_id, expected_usage=_EXP_VCPU_2)
 
         ctx = nova_context.get_admin_context()
         inst = objects.Instance.get_by_uuid(ctx, server['id'])
@@ -146,15 +292,11 @@ class NUMAServersTest(NUMAServersTestBase):
         separate host NUMA node.
         """
 
-        host_info = fakelibvirt.HostInfo(cpu_nodes=1, cpu_sockets=1,
-                                         cpu_cores=2, kB_mem=15740000)
-        fake_connection = self._get_connection(host_info=host_info)
-        self.mock_conn.return_value = fake_connection
-
+        host_info = _cached_host_info(cpu_nodes=1, cpu_sockets=1,
+                                      cpu_cores=2, kB_mem=15740000)
         extra_spec = {'hw:numa_nodes': '2'}
-        flavor_id = self._create_flavor(extra_spec=extra_spec)
 
-        self._run_build_test(flavor_id, end_status='ERROR')
+        self._test_create_server_fails(host_info, extra_spec)
 
     def test_create_server_with_legacy_pinning_policy(self):
         """Create a server using the legacy 'hw:cpu_policy' extra spec.
@@ -166,9 +308,9 @@ class NUMAServersTest(NUMAServersTestBase):
                    group='compute')
         self.flags(vcpu_pin_set=None)
 
-        host_info = fakelibvirt.HostInfo(cpu_nodes=1, cpu_sockets=1,
-                                         cpu_cores=5, cpu_threads=2,
-                                         kB_mem=15740000)
+        host_info = _cached_host_info(cpu_nodes=1, cpu_sockets=1,
+                                      cpu_cores=5, cpu_threads=2,
+                                      kB_mem=15740000)
         fake_connection = self._get_connection(host_info=host_info)
         self.mock_conn.return_value = fake_connection
 
@@ -177,9 +319,7 @@ class NUMAServersTest(NUMAServersTestBase):
             'hw:cpu_thread_policy': 'prefer',
         }
         flavor_id = self._create_flavor(vcpu=5, extra_spec=extra_spec)
-        expected_usage = {'DISK_GB': 20, 'MEMORY_MB': 2048, 'PCPU': 5}
-
-        server = self._run_build_test(flavor_id, expected_usage=expected_usage)
+        server = self._run_build_test(flavor_id, expected_usage=_EXP_PCPU_5)
 
         ctx = nova_context.get_admin_context()
         inst = objects.Instance.get_by_uuid(ctx, server['id'])
@@ -198,9 +338,9 @@ class NUMAServersTest(NUMAServersTestBase):
                    group='compute')
         self.flags(vcpu_pin_set='0-7')
 
-        host_info = fakelibvirt.HostInfo(cpu_nodes=2, cpu_sockets=1,
-                                         cpu_cores=2, cpu_threads=2,
-                                         kB_mem=15740000)
+        host_info = _cached_host_info(cpu_nodes=2, cpu_sockets=1,
+                                      cpu_cores=2, cpu_threads=2,
+                                      kB_mem=15740000)
         fake_connection = self._get_connection(host_info=host_info)
         self.mock_conn.return_value = fake_connection
 
@@ -209,9 +349,7 @@ class NUMAServersTest(NUMAServersTestBase):
             'hw:cpu_thread_policy': 'prefer',
         }
         flavor_id = self._create_flavor(extra_spec=extra_spec)
-        expected_usage = {'DISK_GB': 20, 'MEMORY_MB': 2048, 'VCPU': 2}
-
-        self._run_build_test(flavor_id, expected_usage=expected_usage)
+        self._run_build_test(flavor_id, expected_usage=_EXP_VCPU_2)
 
     def test_create_server_with_legacy_pinning_policy_fails(self):
         """Create a pinned instance on a host with no PCPUs.
@@ -224,18 +362,15 @@ class NUMAServersTest(NUMAServersTestBase):
                    group='compute')
         self.flags(vcpu_pin_set=None)
 
-        host_info = fakelibvirt.HostInfo(cpu_nodes=1, cpu_sockets=1,
-                                         cpu_cores=5, cpu_threads=2,
-                                         kB_mem=15740000)
-        fake_connection = self._get_connection(host_info=host_info)
-        self.mock_conn.return_value = fake_connection
-
+        host_info = _cached_host_info(cpu_nodes=1, cpu_sockets=1,
+                                      cpu_cores=5, cpu_threads=2,
+                                      kB_mem=15740000)
         extra_spec = {
             'hw:cpu_policy': 'dedicated',
             'hw:cpu_thread_policy': 'prefer',
         }
-        flavor_id = self._create_flavor(vcpu=5, extra_spec=extra_spec)
-        self._run_build_test(flavor_id, end_status='ERROR')
+
+        self._test_create_server_fails(host_info, extra_spec, vcpu=5)
 
     def test_create_server_with_legacy_pinning_policy_quota_fails(self):
         """Create a pinned instance on a host with PCPUs but not enough quota.
@@ -246,9 +381,9 @@ class NUMAServersTest(NUMAServersTestBase):
                    group='compute')
         self.flags(vcpu_pin_set=None)
 
-        host_info = fakelibvirt.HostInfo(cpu_nodes=2, cpu_sockets=1,
-                                         cpu_cores=2, cpu_threads=2,
-                                         kB_mem=15740000)
+        host_info = _cached_host_info(cpu_nodes=2, cpu_sockets=1,
+                                      cpu_cores=2, cpu_threads=2,
+                                      kB_mem=15740000)
         fake_connection = self._get_connection(host_info=host_info)
         self.mock_conn.return_value = fake_connection
 
@@ -261,13 +396,7 @@ class NUMAServersTest(NUMAServersTestBase):
         # Update the core quota less than we requested
         self.api.update_quota({'cores': 1})
 
-        # NOTE(bhagyashris): Always use host as 'compute1' so that it's
-        # possible to get resource provider information for verifying
-        # compute usages. This host name 'compute1' is hard coded in
-        # Connection class in fakelibvirt.py.
-        # TODO(stephenfin): Remove the hardcoded limit, possibly overridding
-        # 'start_service' to make sure there isn't a mismatch
-        self.compute = self.start_service('compute', host='compute1')
+        self.compute = self._ensure_compute()
 
         post = {'server': self._build_server(flavor_id)}
 
@@ -285,17 +414,15 @@ class NUMAServersTest(NUMAServersTestBase):
                    group='compute')
         self.flags(vcpu_pin_set=None)
 
-        host_info = fakelibvirt.HostInfo(cpu_nodes=2, cpu_sockets=1,
-                                         cpu_cores=2, cpu_threads=2,
-                                         kB_mem=15740000)
+        host_info = _cached_host_info(cpu_nodes=2, cpu_sockets=1,
+                                      cpu_cores=2, cpu_threads=2,
+                                      kB_mem=15740000)
         fake_connection = self._get_connection(host_info=host_info)
         self.mock_conn.return_value = fake_connection
 
         extra_spec = {'resources:PCPU': '2'}
         flavor_id = self._create_flavor(vcpu=2, extra_spec=extra_spec)
-        expected_usage = {'DISK_GB': 20, 'MEMORY_MB': 2048, 'PCPU': 2}
-
-        server = self._run_build_test(flavor_id, expected_usage=expected_usage)
+        server = self._run_build_test(flavor_id, expected_usage=_EXP_PCPU_2)
 
         ctx = nova_context.get_admin_context()
         inst = objects.Instance.get_by_uuid(ctx, server['id'])
@@ -314,16 +441,13 @@ class NUMAServersTest(NUMAServersTestBase):
                    group='compute')
         self.flags(vcpu_pin_set=None)
 
-        host_info = fakelibvirt.HostInfo(cpu_nodes=1, cpu_sockets=1,
-                                         cpu_cores=5, cpu_threads=2,
-                                         kB_mem=15740000)
-        fake_connection = self._get_connection(host_info=host_info)
-        self.mock_conn.return_value = fake_connection
-
+        host_info = _cached_host_info(cpu_nodes=1, cpu_sockets=1,
+                                      cpu_cores=5, cpu_threads=2,
+                                      kB_mem=15740000)
         extra_spec = {'resources:PCPU': 2}
-        flavor_id = self._create_flavor(vcpu=2, extra_spec=extra_spec)
-        self._run_build_test(flavor_id, end_status='ERROR',
-                             filter_called_on_error=False)
+
+        self._test_create_server_fails(host_info, extra_spec,
+                                       filter_called_on_error=False)
 
     def test_create_server_with_pcpu_quota_fails(self):
         """Create a pinned instance on a host with PCPUs but not enough quota.
@@ -334,9 +458,9 @@ class NUMAServersTest(NUMAServersTestBase):
                    group='compute')
         self.flags(vcpu_pin_set=None)
 
-        host_info = fakelibvirt.HostInfo(cpu_nodes=2, cpu_sockets=1,
-                                         cpu_cores=2, cpu_threads=2,
-                                         kB_mem=15740000)
+        host_info = _cached_host_info(cpu_nodes=2, cpu_sockets=1,
+                                      cpu_cores=2, cpu_threads=2,
+                                      kB_mem=15740000)
         fake_connection = self._get_connection(host_info=host_info)
         self.mock_conn.return_value = fake_connection
 
@@ -346,13 +470,7 @@ class NUMAServersTest(NUMAServersTestBase):
         # Update the core quota less than we requested
         self.api.update_quota({'cores': 1})
 
-        # NOTE(bhagyashris): Always use host as 'compute1' so that it's
-        # possible to get resource provider information for verifying
-        # compute usages. This host name 'compute1' is hard coded in
-        # Connection class in fakelibvirt.py.
-        # TODO(stephenfin): Remove the hardcoded limit, possibly overridding
-        # 'start_service' to make sure there isn't a mismatch
-        self.compute = self.start_service('compute', host='compute1')
+        self.compute = self._ensure_compute()
 
         post = {'server': self._build_server(flavor_id)}
 
@@ -384,6 +502,8 @@ class NUMAServersTest(NUMAServersTestBase):
 
         original_host = server['OS-EXT-SRV-ATTR:host']
 
+        compute_usages = self._get_provider_usages(
+            self.compute_rp_uuids.values())
         for host, compute_rp_uuid in self.compute_rp_uuids.items():
             if host == original_host:  # the host with the instance
                 expected_usage = {'VCPU': 2, 'PCPU': 0, 'DISK_GB': 20,
@@ -392,25 +512,18 @@ class NUMAServersTest(NUMAServersTestBase):
                 expected_usage = {'VCPU': 0, 'PCPU': 0, 'DISK_GB': 0,
                                   'MEMORY_MB': 0}
 
-            compute_usage = self.placement_api.get(
-                '/resource_providers/%s/usages' % compute_rp_uuid).body[
-                    'usages']
-            self.assertEqual(expected_usage, compute_usage)
+            self.assertEqual(expected_usage, compute_usages[compute_rp_uuid])
 
         # We reset mock_filter because we want to ensure it's called as part of
         # the *migration*
-        self.mock_filter.reset_mock()
+        self.mock_filter.reset()
         self.assertEqual(0, len(self.mock_filter.call_args_list))
 
         extra_spec = {'hw:cpu_policy': 'dedicated'}
         flavor_b_id = self._create_flavor(extra_spec=extra_spec)
 
-        # TODO(stephenfin): The mock of 'migrate_disk_and_power_off' should
-        # probably be less...dumb
-        with mock.patch('nova.virt.libvirt.driver.LibvirtDriver'
-                        '.migrate_disk_and_power_off', return_value='{}'):
-            post = {'resize': {'flavorRef': flavor_b_id}}
-            self.api.post_server_action(server['id'], post)
+        post = {'resize': {'flavorRef': flavor_b_id}}
+        self.api.post_server_action(server['id'], post)
 
         server = self._wait_for_state_change(server, 'VERIFY_RESIZE')
 
@@ -421,6 +534,8 @@ class NUMAServersTest(NUMAServersTestBase):
         # all we want to know is whether the filter was correct and the
         # resource usage has been updated
 
+        compute_usages = self._get_provider_usages(
+            self.compute_rp_uuids.values())
         for host, compute_rp_uuid in self.compute_rp_uuids.items():
             if host == original_host:
                 # the host that had the instance should still have allocations
@@ -433,10 +548,7 @@ class NUMAServersTest(NUMAServersTestBase):
                 expected_usage = {'VCPU': 0, 'PCPU': 2, 'DISK_GB': 20,
                                   'MEMORY_MB': 2048}
 
-            compute_usage = self.placement_api.get(
-                '/resource_providers/%s/usages' % compute_rp_uuid).body[
-                    'usages']
-            self.assertEqual(expected_usage, compute_usage)
+            self.assertEqual(expected_usage, compute_usages[compute_rp_uuid])
 
         self.assertEqual(1, len(self.mock_filter.call_args_list))
         args, kwargs = self.mock_filter.call_args_list[0]
@@ -450,6 +562,8 @@ class NUMAServersTest(NUMAServersTestBase):
 
         server = self._wait_for_state_change(server, 'ACTIVE')
 
+        compute_usages = self._get_provider_usages(
+            self.compute_rp_uuids.values())
         for host, compute_rp_uuid in self.compute_rp_uuids.items():
             if host == original_host:
                 # the host that had the instance should no longer have
@@ -462,17 +576,14 @@ class NUMAServersTest(NUMAServersTestBase):
                 expected_usage = {'VCPU': 0, 'PCPU': 2, 'DISK_GB': 20,
                                   'MEMORY_MB': 2048}
 
-            compute_usage = self.placement_api.get(
-                '/resource_providers/%s/usages' % compute_rp_uuid).body[
-                    'usages']
-            self.assertEqual(expected_usage, compute_usage)
+            self.assertEqual(expected_usage, compute_usages[compute_rp_uuid])
 
 
 class NUMAServerTestWithCountingQuotaFromPlacement(NUMAServersTest):
 
     def setUp(self):
         self.flags(count_usage_from_placement=True, group='quota')
-        super(NUMAServersTest, self).setUp()
+        super(NUMAServerTestWithCountingQuotaFromPlacement, self).setUp()
 
 
 class ReshapeForPCPUsTest(NUMAServersTestBase):
@@ -509,9 +620,9 @@ class ReshapeForPCPUsTest(NUMAServersTestBase):
                    group='compute')
         self.flags(vcpu_pin_set='0-7')
 
-        host_info = fakelibvirt.HostInfo(cpu_nodes=2, cpu_sockets=1,
-                                         cpu_cores=2, cpu_threads=2,
-                                         kB_mem=15740000)
+        host_info = _cached_host_info(cpu_nodes=2, cpu_sockets=1,
+                                      cpu_cores=2, cpu_threads=2,
+                                      kB_mem=15740000)
 
         # Start services
         self.start_computes(save_rp_uuids=True)
@@ -535,19 +646,17 @@ class ReshapeForPCPUsTest(NUMAServersTestBase):
         server_req['host'] = 'test_compute0'
         server_req['networks'] = 'auto'
 
+        # the two boots are independent so issue both requests before waiting
+        # on either of them
         created_server1 = self.api.post_server({'server': server_req})
-        server1 = self._wait_for_state_change(created_server1, 'ACTIVE')
-
         created_server2 = self.api.post_server({'server': server_req})
+        server1 = self._wait_for_state_change(created_server1, 'ACTIVE')
         server2 = self._wait_for_state_change(created_server2, 'ACTIVE')
 
         # sanity check usages
 
         compute_rp_uuid = self.compute_rp_uuids['test_compute0']
 
-        compute_inventory = self.placement_api.get(
-            '/resource_providers/%s/inventories' % compute_rp_uuid).body[
-                'inventories']
         compute_usages = self.placement_api.get(
             '/resource_providers/%s/usages' % compute_rp_uuid).body[
                 'usages']
@@ -555,9 +664,6 @@ class ReshapeForPCPUsTest(NUMAServersTestBase):
 
         compute_rp_uuid = self.compute_rp_uuids['test_compute1']
 
-        compute_inventory = self.placement_api.get(
-            '/resource_providers/%s/inventories' % compute_rp_uuid).body[
-                'inventories']
         compute_usages = self.placement_api.get(
             '/resource_providers/%s/usages' % compute_rp_uuid).body[
                 'usages']
@@ -565,10 +671,8 @@ class ReshapeForPCPUsTest(NUMAServersTestBase):
 
         # now initiate the migration process for one of the servers
 
-        with mock.patch('nova.virt.libvirt.driver.LibvirtDriver'
-                        '.migrate_disk_and_power_off', return_value='{}'):
-            post = {'migrate': None}
-            self.api.post_server_action(server2['id'], post)
+        post = {'migrate': None}
+        self.api.post_server_action(server2['id'], post)
 
         server2 = self._wait_for_state_change(server2, 'VERIFY_RESIZE')
 
@@ -582,46 +686,28 @@ class ReshapeForPCPUsTest(NUMAServersTestBase):
 
         compute_rp_uuid = self.compute_rp_uuids['test_compute0']
 
-        compute_inventory = self.placement_api.get(
-            '/resource_providers/%s/inventories' % compute_rp_uuid).body[
-                'inventories']
-        self.assertEqual(8, compute_inventory['VCPU']['total'])
-        self.assertNotIn('PCPU', compute_inventory)
-        compute_usages = self.placement_api.get(
-            '/resource_providers/%s/usages' % compute_rp_uuid).body[
-                'usages']
-        self.assertEqual(4, compute_usages['VCPU'])
-        self.assertNotIn('PCPU', compute_usages)
-
-        allocations = self.placement_api.get(
-            '/allocations/%s' % server1['id']).body['allocations']
+        snapshot = self._get_rp_snapshot(compute_rp_uuid, server1['id'])
+        self.assertEqual(8, snapshot.inventory['VCPU']['total'])
+        self.assertNotIn('PCPU', snapshot.inventory)
+        self.assertEqual(4, snapshot.usages['VCPU'])
+        self.assertNotIn('PCPU', snapshot.usages)
         # the flavor has disk=10 and ephemeral=10
         self.assertEqual(
-            {'DISK_GB': 20, 'MEMORY_MB': 2048, 'VCPU': 2},
-            allocations[compute_rp_uuid]['resources'])
+            _EXP_VCPU_2, snapshot.allocations[compute_rp_uuid]['resources'])
 
         # then check 'test_compute1', which should have the allocations for
         # server2 (the one that has been migrated)
 
         compute_rp_uuid = self.compute_rp_uuids['test_compute1']
 
-        compute_inventory = self.placement_api.get(
-            '/resource_providers/%s/inventories' % compute_rp_uuid).body[
-                'inventories']
-        self.assertEqual(8, compute_inventory['VCPU']['total'])
-        self.assertNotIn('PCPU', compute_inventory)
-        compute_usages = self.placement_api.get(
-            '/resource_providers/%s/usages' % compute_rp_uuid).body[
-                'usages']
-        self.assertEqual(2, compute_usages['VCPU'])
-        self.assertNotIn('PCPU', compute_usages)
-
-        allocations = self.placement_api.get(
-            '/allocations/%s' % server2['id']).body['allocations']
+        snapshot = self._get_rp_snapshot(compute_rp_uuid, server2['id'])
+        self.assertEqual(8, snapshot.inventory['VCPU']['total'])
+        self.assertNotIn('PCPU', snapshot.inventory)
+        self.assertEqual(2, snapshot.usages['VCPU'])
+        self.assertNotIn('PCPU', snapshot.usages)
         # the flavor has disk=10 and ephemeral=10
         self.assertEqual(
-            {'DISK_GB': 20, 'MEMORY_MB': 2048, 'VCPU': 2},
-            allocations[compute_rp_uuid]['resources'])
+            _EXP_VCPU_2, snapshot.allocations[compute_rp_uuid]['resources'])
 
         # set the new config options on the compute services and restart them,
         # meaning the compute services will now report PCPUs and reshape
@@ -656,46 +742,28 @@ class ReshapeForPCPUsTest(NUMAServersTestBase):
 
         compute_rp_uuid = self.compute_rp_uuids['test_compute0']
 
-        compute_inventory = self.placement_api.get(
-            '/resource_providers/%s/inventories' % compute_rp_uuid).body[
-                'inventories']
-        self.assertEqual(8, compute_inventory['PCPU']['total'])
-        self.assertNotIn('VCPU', compute_inventory)
-        compute_usages = self.placement_api.get(
-            '/resource_providers/%s/usages' % compute_rp_uuid).body[
-                'usages']
-        self.assertEqual(4, compute_usages['PCPU'])
-        self.assertNotIn('VCPU', compute_usages)
-
-        allocations = self.placement_api.get(
-            '/allocations/%s' % server1['id']).body['allocations']
+        snapshot = self._get_rp_snapshot(compute_rp_uuid, server1['id'])
+        self.assertEqual(8, snapshot.inventory['PCPU']['total'])
+        self.assertNotIn('VCPU', snapshot.inventory)
+        self.assertEqual(4, snapshot.usages['PCPU'])
+        self.assertNotIn('VCPU', snapshot.usages)
         # the flavor has disk=10 and ephemeral=10
         self.assertEqual(
-            {'DISK_GB': 20, 'MEMORY_MB': 2048, 'PCPU': 2},
-            allocations[compute_rp_uuid]['resources'])
+            _EXP_PCPU_2, snapshot.allocations[compute_rp_uuid]['resources'])
 
         # then check 'test_compute1', which should have the allocations for
         # server2 (the one that has been migrated)
 
         compute_rp_uuid = self.compute_rp_uuids['test_compute1']
 
-        compute_inventory = self.placement_api.get(
-            '/resource_providers/%s/inventories' % compute_rp_uuid).body[
-                'inventories']
-        self.assertEqual(8, compute_inventory['PCPU']['total'])
-        self.assertNotIn('VCPU', compute_inventory)
-        compute_usages = self.placement_api.get(
-            '/resource_providers/%s/usages' % compute_rp_uuid).body[
-                'usages']
-        self.assertEqual(2, compute_usages['PCPU'])
-        self.assertNotIn('VCPU', compute_usages)
-
-        allocations = self.placement_api.get(
-            '/allocations/%s' % server2['id']).body['allocations']
+        snapshot = self._get_rp_snapshot(compute_rp_uuid, server2['id'])
+        self.assertEqual(8, snapshot.inventory['PCPU']['total'])
+        self.assertNotIn('VCPU', snapshot.inventory)
+        self.assertEqual(2, snapshot.usages['PCPU'])
+        self.assertNotIn('VCPU', snapshot.usages)
         # the flavor has disk=10 and ephemeral=10
         self.assertEqual(
-            {'DISK_GB': 20, 'MEMORY_MB': 2048, 'PCPU': 2},
-            allocations[compute_rp_uuid]['resources'])
+            _EXP_PCPU_2, snapshot.allocations[compute_rp_uuid]['resources'])
 
         # now create one more instance with pinned instances against the
         # reshaped tree which should result in PCPU allocations
@@ -705,29 +773,18 @@ class ReshapeForPCPUsTest(NUMAServersTestBase):
 
         compute_rp_uuid = self.compute_rp_uuids['test_compute0']
 
-        compute_inventory = self.placement_api.get(
-            '/resource_providers/%s/inventories' % compute_rp_uuid).body[
-                'inventories']
-        self.assertEqual(8, compute_inventory['PCPU']['total'])
-        self.assertNotIn('VCPU', compute_inventory)
-        compute_usages = self.placement_api.get(
-            '/resource_providers/%s/usages' % compute_rp_uuid).body[
-                'usages']
-        self.assertEqual(6, compute_usages['PCPU'])
-        self.assertNotIn('VCPU', compute_usages)
+        snapshot = self._get_rp_snapshot(compute_rp_uuid, server3['id'])
+        self.assertEqual(8, snapshot.inventory['PCPU']['total'])
+        self.assertNotIn('VCPU', snapshot.inventory)
+        self.assertEqual(6, snapshot.usages['PCPU'])
+        self.assertNotIn('VCPU', snapshot.usages)
 
         # check the allocations for this server specifically
 
-        allocations = self.placement_api.get(
-            '/allocations/%s' % server3['id']).body[
-                'allocations']
         self.assertEqual(
-            {'DISK_GB': 20, 'MEMORY_MB': 2048, 'PCPU': 2},
-            allocations[compute_rp_uuid]['resources'])
+            _EXP_PCPU_2, snapshot.allocations[compute_rp_uuid]['resources'])
 
-        self._delete_server(server1)
-        self._delete_server(server2)
-        self._delete_server(server3)
+        self._delete_servers([server1, server2, server3])
 
 
 class NUMAServersWithNetworksTest(NUMAServersTestBase):
@@ -750,32 +807,20 @@ class NUMAServersWithNetworksTest(NUMAServersTestBase):
 
     def _test_create_server_with_networks(self, flavor_id, networks,
                                           end_status='ACTIVE'):
-        host_info = fakelibvirt.HostInfo(cpu_nodes=2, cpu_sockets=1,
-                                         cpu_cores=2, cpu_threads=2,
-                                         kB_mem=15740000)
+        host_info = _cached_host_info(cpu_nodes=2, cpu_sockets=1,
+                                      cpu_cores=2, cpu_threads=2,
+                                      kB_mem=15740000)
         fake_connection = self._get_connection(host_info=host_info)
         self.mock_conn.return_value = fake_connection
 
         self.compute = self.start_service('compute', host='test_compute0')
 
-        # Create server
-        good_server = self._build_server(flavor_id)
-        good_server['networks'] = networks
-        post = {'server': good_server}
-
-        created_server = self.api.post_server(post)
-        LOG.debug("created_server: %s", created_server)
-
-        found_server = self.api.get_server(created_server['id'])
-
-        return self._wait_for_state_change(found_server, end_status)
+        return self._create_and_wait(flavor_id, networks, end_status)
 
     def test_create_server_with_single_physnet(self):
         extra_spec = {'hw:numa_nodes': '1'}
         flavor_id = self._create_flavor(extra_spec=extra_spec)
-        networks = [
-            {'uuid': base.LibvirtNeutronFixture.network_1['id']},
-        ]
+        networks = list(_NET1)
 
         self._test_create_server_with_networks(flavor_id, networks)
 
@@ -790,10 +835,7 @@ class NUMAServersWithNetworksTest(NUMAServersTestBase):
         """
         extra_spec = {'hw:numa_nodes': '2'}
         flavor_id = self._create_flavor(extra_spec=extra_spec)
-        networks = [
-            {'uuid': base.LibvirtNeutronFixture.network_1['id']},
-            {'uuid': base.LibvirtNeutronFixture.network_2['id']},
-        ]
+        networks = list(_NET12)
 
         self._test_create_server_with_networks(flavor_id, networks)
 
@@ -807,10 +849,7 @@ class NUMAServersWithNetworksTest(NUMAServersTestBase):
         """
         extra_spec = {'hw:numa_nodes': '1'}
         flavor_id = self._create_flavor(extra_spec=extra_spec)
-        networks = [
-            {'uuid': base.LibvirtNeutronFixture.network_1['id']},
-            {'uuid': base.LibvirtNeutronFixture.network_2['id']},
-        ]
+        networks = list(_NET12)
 
         self._test_create_server_with_networks(flavor_id, networks,
                                                end_status='ERROR')
@@ -825,10 +864,7 @@ class NUMAServersWithNetworksTest(NUMAServersTestBase):
         """
         extra_spec = {'hw:numa_nodes': '1'}
         flavor_id = self._create_flavor(extra_spec=extra_spec)
-        networks = [
-            {'uuid': base.LibvirtNeutronFixture.network_1['id']},
-            {'uuid': base.LibvirtNeutronFixture.network_3['id']},
-        ]
+        networks = list(_NET13)
 
         self._test_create_server_with_networks(flavor_id, networks)
 
@@ -837,9 +873,7 @@ class NUMAServersWithNetworksTest(NUMAServersTestBase):
     def test_rebuild_server_with_network_affinity(self):
         extra_spec = {'hw:numa_nodes': '1'}
         flavor_id = self._create_flavor(extra_spec=extra_spec)
-        networks = [
-            {'uuid': base.LibvirtNeutronFixture.network_1['id']},
-        ]
+        networks = list(_NET1)
 
         server = self._test_create_server_with_networks(flavor_id, networks)
 
@@ -878,7 +912,7 @@ class NUMAServersWithNetworksTest(NUMAServersTestBase):
         # is a cast, but since we are using CastAsCall this will bubble to the
         # API.
         self.assertEqual(500, ex.response.status_code)
-        self.assertIn('NoValidHost', six.text_type(ex))
+        self.assertIn('NoValidHost', str(ex))
 
     def test_cold_migrate_with_physnet(self):
 
@@ -888,31 +922,20 @@ class NUMAServersWithNetworksTest(NUMAServersTestBase):
         # Create server
         extra_spec = {'hw:numa_nodes': '1'}
         flavor_id = self._create_flavor(extra_spec=extra_spec)
-        networks = [
-            {'uuid': base.LibvirtNeutronFixture.network_1['id']},
-        ]
+        networks = list(_NET1)
 
-        good_server = self._build_server(flavor_id)
-        good_server['networks'] = networks
-        post = {'server': good_server}
-
-        created_server = self.api.post_server(post)
-        server = self._wait_for_state_change(created_server, 'ACTIVE')
+        server = self._create_and_wait(flavor_id, networks)
 
         original_host = server['OS-EXT-SRV-ATTR:host']
 
         # We reset mock_filter because we want to ensure it's called as part of
         # the *migration*
-        self.mock_filter.reset_mock()
+        self.mock_filter.reset()
         self.assertEqual(0, len(self.mock_filter.call_args_list))
 
-        # TODO(stephenfin): The mock of 'migrate_disk_and_power_off' should
-        # probably be less...dumb
-        with mock.patch('nova.virt.libvirt.driver.LibvirtDriver'
-                        '.migrate_disk_and_power_off', return_value='{}'):
-            self.api.post_server_action(server['id'], {'migrate': None})
+        self.api.post_server_action(server['id'], {'migrate': None})
 
-        server = self._wait_for_state_change(created_server, 'VERIFY_RESIZE')
+        server = self._wait_for_state_change(server, 'VERIFY_RESIZE')
 
         # We don't bother confirming the resize as we expect this to have
         # landed and all we want to know is whether the filter was correct
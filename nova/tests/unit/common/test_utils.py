@@ -0,0 +1,88 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from nova.common import utils
+from nova import test
+
+
+@mock.patch.object(utils, 'LOG')
+class LogEntryTestCase(test.NoDBTestCase):
+
+    def test_log_entry(self, mock_log):
+        mock_log.isEnabledFor.return_value = True
+
+        def inner():
+            utils.log_entry()
+
+        def outer():
+            inner()
+
+        outer()
+        mock_log.info.assert_called_once_with(
+            "%s(): caller: %s", 'inner', 'outer')
+
+    def test_log_entry_msg(self, mock_log):
+        mock_log.isEnabledFor.return_value = True
+
+        def inner():
+            utils.log_entry_msg('x')
+
+        def outer():
+            inner()
+
+        outer()
+        mock_log.info.assert_called_once_with(
+            "%s(): caller: %s [%s]", 'inner', 'outer', 'x')
+
+    @mock.patch.object(utils, '_getframe')
+    def test_log_entry_info_disabled(self, mock_getframe, mock_log):
+        mock_log.isEnabledFor.return_value = False
+
+        utils.log_entry()
+        utils.log_entry_msg('x')
+
+        mock_getframe.assert_not_called()
+        mock_log.info.assert_not_called()
+
+
+@mock.patch.object(utils, 'LOG')
+class LogEntryDecoratorTestCase(test.NoDBTestCase):
+
+    def test_log_entry_decorator(self, mock_log):
+        mock_log.isEnabledFor.return_value = True
+
+        @utils.log_entry_decorator
+        def decorated(a, b=None):
+            return (a, b)
+
+        def caller():
+            return decorated(1, b=2)
+
+        self.assertEqual((1, 2), caller())
+        self.assertEqual('decorated', decorated.__name__)
+        mock_log.info.assert_called_once_with(
+            "decorated(): caller: %s", 'caller')
+
+    @mock.patch.object(utils, '_getframe')
+    def test_log_entry_decorator_info_disabled(self, mock_getframe,
+                                               mock_log):
+        mock_log.isEnabledFor.return_value = False
+
+        @utils.log_entry_decorator
+        def decorated():
+            return 'result'
+
+        self.assertEqual('result', decorated())
+        mock_getframe.assert_not_called()
+        mock_log.info.assert_not_called()